@@ -23,10 +23,73 @@ L = 7
     1 for P1 castling
     1 for P2 castling
     1 for no-progress count
+    The planes are boolean, so the move and no-progress counts only show whether they are nonzero
 """
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
+# Bitboards of the single flag channels
+ONES = chess.BB_ALL
+ZEROS = chess.BB_EMPTY
+
+# Values of the channels of get_encoded_state
+ENCODED_VALUES = np.array([-1, 0, 1])
+
+# Order of the M channels from black's perspective, black pieces first
+BLACK_PLANES = list(range(6, 12)) + list(range(6)) + [12, 13]
+
+# Order of the L channels from black's perspective, black castling first
+BLACK_L_PLANES = [0, 1, 4, 5, 2, 3, 6]
+
+#list for for movement, (x (+ ->), y (- ^))
+#direction for both sets of movements start from top and rotates clockwise
+QUEEN_DIRECTIONS = [
+    (0,-1), #0
+    (1,-1), #1
+    (1,0), #2
+    (1,1), #3
+    (0,1), #4
+    (-1,1), #5
+    (-1,0), #6
+    (-1,-1) #7
+]
+
+KNIGHT_MOVES = [
+    (1,-2), #0
+    (2,-1), #1
+    (2,1), #2
+    (1,2), #3
+    (-1,2), #4
+    (-2,1), #5
+    (-2,-1), #6
+    (-1,-2) #7
+]
+
+#Underpromotion pieces in plane order, 0 for no underpromotion
+PROMOTIONS = [None, chess.KNIGHT, chess.BISHOP, chess.ROOK]
+
+# (dx, dy) of the move of every plane, and its underpromotion as an index into PROMOTIONS
+PLANE_DELTAS = np.zeros((73, 2), dtype=np.int64)
+PLANE_PROMOTIONS = np.zeros(73, dtype=np.int64)
+
+#Queen moves, planes 0-55
+for direction, (dx, dy) in enumerate(QUEEN_DIRECTIONS):
+    for squares in range(1, 8):
+        PLANE_DELTAS[direction*7 + squares-1] = dx*squares, dy*squares
+
+#Knight moves, planes 56-63
+for direction, (dx, dy) in enumerate(KNIGHT_MOVES):
+    PLANE_DELTAS[56 + direction] = dx, dy
+
+#Underpromotions from row 7, planes 64-72: forward, right diagonal capture, left diagonal capture for each piece
+for plane in range(9):
+    PLANE_DELTAS[64 + plane] = (0, 1, -1)[plane%3], -1
+    PLANE_PROMOTIONS[64 + plane] = 1 + plane//3
+
+# Plane of every queen and knight move indexed by [dx + 7, dy + 7], -1 if it is neither
+MOVE_PLANES = np.full((15, 15), -1, dtype=np.int64)
+MOVE_PLANES[PLANE_DELTAS[:64, 0]+7, PLANE_DELTAS[:64, 1]+7] = np.arange(64)
+
 class ChessTensor():
     def __init__(self, chess960=False):
         self.M = 14
@@ -34,116 +97,134 @@ class ChessTensor():
         self.L = 7
         self.start_board(chess960=chess960)
 
-    # This is to get a single tensor representation of the board
-    def __board_to_tensor(self, board) -> torch.Tensor:
-        """ Convert the chess library board to a tensor representation"""
-        order = {
-            chess.PAWN: 0,
-            chess.KNIGHT: 1,
-            chess.BISHOP: 2,
-            chess.ROOK: 3,
-            chess.QUEEN: 4,
-            chess.KING: 5,
-        }
+    # This is to get a single bitboard representation of the board
+    def __board_to_bitboards(self, board) -> List[int]:
+        """ Convert the chess library board to its 12 piece bitboards """
+        # Read the piece bitboards directly, in chess.PIECE_TYPES order
+        pieces = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+        white, black = board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK]
 
         # 6 white + 6 black
-        representation = torch.zeros(12, 8, 8, dtype=torch.bool)   
-
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece:
-                # Determine the value to assign (positive for white, negative for black)
-                channel = order[piece.piece_type]
-                if piece.color == chess.BLACK:
-                    channel += 6
-
-                row, col = divmod(square, 8)
-                representation[channel, row, col] = 1
-
-        return representation
+        return [piece & white for piece in pieces] + [piece & black for piece in pieces]
 
     def start_board(self, chess960=False):
-        """ Initialize the board as a tensor """
+        """ Initialize the board as bitboards """
         if chess960:
             print('Starting chess960')
             self.board = chess.Board.from_chess960_pos(random.randint(0, 959))
         else:
             self.board = chess.Board()
 
-        # Get board current state
-        board_tensor = self.__board_to_tensor(self.board)
-        repetition_tensor = torch.zeros(2, 8, 8, dtype=torch.bool)
-        current_representation = torch.cat([board_tensor, repetition_tensor], 0)
+        # T boards of M bitboards used as a ring buffer, one per perspective
+        # self.head is the board holding the current state, older boards follow it
+        # Square index is row * 8 + col, so storing white's bitboards big-endian reverses the rows
+        # and unpacking black's bitboards in big bit order reverses the columns, no flip needed
+        self.head = 0
+        self.history = np.zeros((self.T, self.M), dtype=">u8")
+        self.black_history = np.zeros((self.T, self.M), dtype="<u8")
+
+        # Get board current state, no repetitions yet
+        self.history[0, :12] = self.__board_to_bitboards(self.board)
+        self.black_history[0] = self.history[0, BLACK_PLANES]
 
-        # Adding L channel
-        white = torch.ones(1, 8, 8, dtype=torch.bool)
-        black = torch.zeros(1, 8, 8, dtype=torch.bool)
-        total_moves = torch.zeros(1, 8, 8, dtype=torch.bool)
-        castling = torch.ones(4,8,8, dtype=torch.bool)
-        no_progress = torch.zeros(1, 8, 8, dtype=torch.bool)
+        # Adding L channel, colour, no moves yet and all castling rights
+        self.L_planes = np.zeros(self.L, dtype="<u8")
+        self.black_L_planes = np.zeros(self.L, dtype="<u8")
 
-        self.representation = torch.cat([current_representation, torch.zeros(self.M * (self.T - 1), 8, 8, dtype=torch.bool), white, total_moves, castling, no_progress], 0)
-        self.black_representation = torch.cat([current_representation[6:12], current_representation[:6], repetition_tensor, torch.zeros(self.M * (self.T - 1), 8, 8, dtype=torch.bool), black, total_moves, castling, no_progress], 0)
+        self.__set_L_planes(np.array([True, False, True, True, True, True, False]))
     
-    def move_piece(self, move: chess.Move) -> torch.Tensor:
+    def move_piece(self, move: chess.Move) -> None:
         """ Move a piece on the board """
         # Validating correct move
-        if move not in self.board.legal_moves:
+        if not self.board.is_legal(move):
             raise ValueError("Invalid move")
 
+        self.move_piece_unchecked(move)
+
+    def move_piece_unchecked(self, move: chess.Move) -> None:
+        """ Move a piece on the board, for moves already known to be legal """
         # Moving the board forward
         self.board.push(move)
 
-        # Get board current state
-        board_tensor = self.__board_to_tensor(self.board)
+        # Add repetition planes
+        # A position can only repeat after 4 reversible plies, and a second repetition implies the first
+        reversible = self.board.halfmove_clock >= 4
+        repetition_2 = reversible and self.board.is_repetition(3)
+        repetition_1 = repetition_2 or (reversible and self.board.is_repetition(2))
 
-        # Add repetition tensor
-        repetition_1 = self.board.is_repetition(2)
-        repetition_2 = self.board.is_repetition(3)
+        # Overwrite the oldest board with the current state
+        self.head = (self.head - 1) % self.T
+        self.history[self.head] = self.__board_to_bitboards(self.board) + [ONES if repetition_1 else ZEROS, ONES if repetition_2 else ZEROS]
+        self.black_history[self.head] = self.history[self.head, BLACK_PLANES]
 
-        repetition_1_tensor = torch.ones(1, 8, 8, dtype=torch.bool) if repetition_1 else torch.zeros(1, 8, 8, dtype=torch.bool)
-        repetition_2_tensor = torch.ones(1, 8, 8, dtype=torch.bool) if repetition_2 else torch.zeros(1, 8, 8, dtype=torch.bool)
+        # Adding L channel: colour, total moves, white and black castling, no progress
+        # Boolean planes cannot hold the counts, only whether any move / reversible move has been played
+        white_king_castling, white_queen_castling, black_king_castling, black_queen_castling = (bool(rights) for rights in self.__castling_rights())
 
-        # Get current tensor
-        current_tensor = torch.cat([board_tensor, repetition_1_tensor, repetition_2_tensor], 0)
-        
-        # Adding L channel
-        white =  torch.ones(1, 8, 8, dtype=torch.bool)
-        black = torch.zeros(1, 8, 8, dtype=torch.bool)
-        total_moves = torch.tensor([len(self.board.move_stack)], dtype=torch.bool).reshape(1, 1, 1).expand(1, 8, 8)
-        white_king_castling = torch.ones(1, 8, 8, dtype=torch.bool) if self.board.has_kingside_castling_rights(chess.WHITE) else torch.zeros(1, 8, 8, dtype=torch.bool)
-        white_queen_castling = torch.ones(1, 8, 8, dtype=torch.bool) if self.board.has_queenside_castling_rights(chess.WHITE) else torch.zeros(1, 8, 8, dtype=torch.bool)
-        black_king_castling = torch.ones(1, 8, 8, dtype=torch.bool) if self.board.has_kingside_castling_rights(chess.BLACK) else torch.zeros(1, 8, 8, dtype=torch.bool)
-        black_queen_castling = torch.ones(1, 8, 8, dtype=torch.bool) if self.board.has_queenside_castling_rights(chess.BLACK) else torch.zeros(1, 8, 8, dtype=torch.bool)
-        no_progress = torch.tensor([self.board.halfmove_clock], dtype=torch.bool).reshape(1, 1, 1).expand(1, 8, 8)
-
-        L_tensor = torch.cat([white, total_moves, white_king_castling, white_queen_castling, black_king_castling, black_queen_castling, no_progress], 0)
-        L_tensor_black = torch.cat([black, total_moves, black_king_castling, black_queen_castling, white_king_castling, white_queen_castling, no_progress], 0)
-
-        # Remove last M channels and L tensor
-        self.representation = self.representation[:-self.M - self.L]
-        self.black_representation = self.black_representation[:-self.M - self.L]
-
-        # Combining all tensors
-        self.representation = torch.cat([current_tensor, self.representation, L_tensor], 0)
-        self.black_representation = torch.cat([current_tensor[6:12], current_tensor[:6], current_tensor[12:], self.black_representation, L_tensor_black], 0)
+        self.__set_L_planes(np.array([True, bool(self.board.move_stack), white_king_castling, white_queen_castling, black_king_castling, black_queen_castling, bool(self.board.halfmove_clock)]))
+
+    def __set_L_planes(self, flags: np.ndarray) -> None:
+        """ Write the L channels of both perspectives from the flags in white's perspective """
+        self.L_planes[:] = ZEROS
+        self.L_planes[flags] = ONES
+
+        # Black swaps the castling rights and has an empty colour plane
+        self.black_L_planes[:] = self.L_planes[BLACK_L_PLANES]
+        self.black_L_planes[0] = ZEROS
+
+    def __castling_rights(self) -> Tuple[int, int, int, int]:
+        """ Kingside and queenside castling rights of white and black, read from the castling rooks bitboard """
+        castling_rights = self.board.clean_castling_rights()
+        kings = self.board.kings & ~self.board.promoted
+
+        rights = []
+        for color, backrank in ((chess.WHITE, chess.BB_RANK_1), (chess.BLACK, chess.BB_RANK_8)):
+            king = kings & self.board.occupied_co[color] & backrank
+            rooks = castling_rights & backrank if king else 0
+
+            # Kingside rooks are on squares above the king, queenside rooks below
+            rights += [rooks & -(king << 1), rooks & (king - 1)]
+
+        return tuple(rights)
         
-    def get_representation(self) -> torch.Tensor:
-        """ Get the current board representation in the player's perspective """
+    def get_bitboards(self) -> Tuple[np.ndarray, str]:
+        """ Get the current board as bytes in the player's perspective, with the bit order to unpack them """
         
         # For white representation
         if self.board.turn:
 
-            return torch.flip(self.representation, [1])
-        
+            history, L_planes, bitorder = self.history, self.L_planes, "little"
+
         else:
 
             # Flipping the board for black
-            return torch.flip(self.black_representation, [2])
+            history, L_planes, bitorder = self.black_history, self.black_L_planes, "big"
+
+        # Unroll the ring buffer so that the current board comes first
+        bitboards = np.concatenate([history[self.head:].ravel(), history[:self.head].ravel(), L_planes], dtype=history.dtype)
+
+        return bitboards.view(np.uint8), bitorder
+
+    def get_representation(self) -> torch.Tensor:
+        """ Get the current board representation in the player's perspective """
+        bitboards, bitorder = self.get_bitboards()
+
+        representation = np.unpackbits(bitboards, bitorder=bitorder).reshape(-1, 8, 8)
+
+        return torch.from_numpy(representation.view(np.bool_))
         
     def get_moves(self) -> List[chess.Move]:
         """ Get all possible moves for the current player """
         return list(self.board.legal_moves)
+
+    def get_action_mask(self) -> torch.Tensor:
+        """ Get a mask of the legal actions for the current player, without building the move list """
+        mask = torch.zeros(8*8*73, dtype=torch.bool)
+
+        color = self.board.turn
+        mask[[moveToIndex(move.from_square, move.to_square, color, move.promotion) for move in self.board.generate_legal_moves()]] = True
+
+        return mask
     
 
     # New functions for mcts. State is of type board.
@@ -181,12 +262,73 @@ class ChessTensor():
         return state * player
 
     def get_encoded_state(self, state):  # Something like get_rep, might delete function
-        encoded_state = np.stack(
-            (state == -1, state == 0, state == 1)
-        ).astype(np.float32)
+        # Compare against -1, 0 and 1 in one broadcast pass, writing the float channels directly
+        encoded_state = np.empty((3,) + np.shape(state), dtype=np.float32)
+        np.equal(state, ENCODED_VALUES.reshape((3,) + (1,) * np.ndim(state)), out=encoded_state, casting="unsafe")
 
         return encoded_state
 
+def encode_batch(games:List[ChessTensor], device=device) -> torch.Tensor:
+    """
+    Returns the representations of several games in their player's perspective as one (B, MT + L, 8, 8) tensor on device
+    """
+
+    bitboards, bitorders = zip(*(game.get_bitboards() for game in games))
+    bitboards = np.stack(bitboards)
+    white = np.array([bitorder == "little" for bitorder in bitorders], dtype=bool)
+
+    #One unpack for every position with white to move and one for black
+    representation = np.empty((len(games), bitboards.shape[1]*8), dtype=np.uint8)
+    representation[white] = np.unpackbits(bitboards[white], axis=1, bitorder="little")
+    representation[~white] = np.unpackbits(bitboards[~white], axis=1, bitorder="big")
+
+    representation = torch.from_numpy(representation.view(np.bool_).reshape(len(games), -1, 8, 8))
+
+    #Pin the batch so it goes to the GPU in one asynchronous copy
+    if torch.device(device).type == "cuda":
+        representation = representation.pin_memory()
+
+    return representation.to(device, non_blocking=True)
+
+
+def movesToIndexes(moves:List[chess.Move], color:Union[chess.Color, np.ndarray]=chess.WHITE) -> np.ndarray:
+    """
+    Returns the index in the 8*8*73 action tensor of every move, color can be given per move
+    """
+
+    squares = np.array([(move.from_square, move.to_square, move.promotion or 0) for move in moves], dtype=np.int64).reshape(-1, 3)
+    from_squares, to_squares, promotions = squares.T
+
+    row, col = np.divmod(from_squares, 8)
+    toRow, toCol = np.divmod(to_squares, 8)
+
+    white = np.asarray(color, dtype=bool)
+
+    row = np.where(white, 7-row, row)
+    toRow = np.where(white, 7-toRow, toRow)
+    col = np.where(white, col, 7-col)
+    toCol = np.where(white, toCol, 7-toCol)
+
+    planes = MOVE_PLANES[toCol-col+7, toRow-row+7]
+
+    #Underpromotions, forward, right diagonal capture and left diagonal capture for each piece
+    underpromotion = (promotions >= chess.KNIGHT) & (promotions <= chess.ROOK)
+    planes = np.where(underpromotion, 64 + (promotions-chess.KNIGHT)*3 + np.sign(toCol-col)%3, planes)
+
+    return planes*64 + row*8 + col
+
+
+def movesAndProbs(valid_moves:Union[List[chess.Move], Dict[chess.Move, float]]) -> Tuple[List[chess.Move], np.ndarray]:
+    """
+    Returns the moves and their probabilities, 1 for every move of a list
+    """
+
+    if isinstance(valid_moves, dict):
+        return list(valid_moves.keys()), np.fromiter(valid_moves.values(), dtype=np.float32, count=len(valid_moves))
+
+    return list(valid_moves), np.ones(len(valid_moves), dtype=np.float32)
+
+
 def actionsToTensor(valid_moves:Union[List[chess.Move], Dict[chess.Move, float]], color=chess.WHITE) -> torch.tensor:
     """
     Returns a vector mask of valid actions
@@ -194,218 +336,131 @@ def actionsToTensor(valid_moves:Union[List[chess.Move], Dict[chess.Move, float]]
 
     #Initialize empty action tensor
     actionTensor = torch.zeros(8*8*73)
-    queen_promotion = dict()
 
-    if type(valid_moves) == dict:
-        dictionary = True
-    else:
-        dictionary = False
-
-    for valid_move in valid_moves:
-        if valid_move.promotion == 5:
-            #queen_promotion
-            queen_promotion.update({
-                str(valid_move.uci()):True
-                })
-        
-        if dictionary:
-            prob = valid_moves[valid_move]
-        else:
-            prob = 1
+    moves, probs = movesAndProbs(valid_moves)
 
-        actionTensor += actionToTensor(valid_move, color, prob=prob)
+    #queen_promotion
+    queen_promotion = {move.uci(): True for move in moves if move.promotion == chess.QUEEN}
+
+    indexes = movesToIndexes(moves, color)
+
+    actionTensor.index_put_((torch.from_numpy(indexes),), torch.from_numpy(probs), accumulate=True)
     
     return actionTensor, queen_promotion
     
 
-def actionToTensor(move:chess.Move, color:chess.Color=chess.WHITE, prob:float=1) -> torch.tensor:
-
-    moveTensor = torch.zeros(8*8*73)
-
-    dir = {
-        (0,-1) : 0,
-        (1,-1) : 1,
-        (1,0) : 2,
-        (1,1) : 3,
-        (0,1) : 4,
-        (-1,1) : 5,
-        (-1,0) : 6,
-        (-1,-1) : 7,
-    }
-
-    knight_moves = {
-        (1,-2) : 0,
-        (2,-1) : 1,
-        (2,1) : 2,
-        (1,2) : 3,
-        (-1,2) : 4,
-        (-2,1) : 5,
-        (-2,-1) : 6,
-        (-1,-2) : 7,
-    }
-
-    def check_polarity(val) -> int:
-
-        if val>0:
-            return 1
-        elif val<0:
-            return -1
-        else:
-            return 0
+def moveToIndex(from_square:int, to_square:int, color:chess.Color=chess.WHITE, promotion:int=None) -> int:
+    """
+    Returns the index of a single move in the 8*8*73 action tensor
+    """
 
-    from_square = move.from_square
-    to_square = move.to_square
+    row, col = divmod(from_square, 8)
+    toRow, toCol = divmod(to_square, 8)
 
     if color==chess.WHITE:
-        row = 7-from_square//8
-        col = from_square%8
-        toRow = 7-to_square//8
-        toCol = to_square%8
+        row = 7-row
+        toRow = 7-toRow
     else:
-        row = from_square//8
-        col = 7-from_square%8
-        toRow = to_square//8
-        toCol = 7-to_square%8
-    
-    #Queen Move
-    if toCol == col or toRow == row or abs(toRow-row)/abs(toCol-col)==1:
+        col = 7-col
+        toCol = 7-toCol
 
-        #Check for underpromotion
-        if move.uci()[-1] in "nbr":
+    if promotion in (chess.KNIGHT, chess.BISHOP, chess.ROOK):
+        #Underpromotion, forward, right diagonal capture or left diagonal capture
+        plane = 64 + (promotion-chess.KNIGHT)*3 + (toCol>col) + 2*(toCol<col)
+    else:
+        plane = MOVE_PLANES[toCol-col+7, toRow-row+7]
 
-            i = "nbr".index(move.uci()[-1])
+    return plane*64 + row*8 + col
 
-            i*=3
 
-            if toCol>col:
+def batchActionsToTensor(batch_moves:List[Union[List[chess.Move], Dict[chess.Move, float]]], colors:List[chess.Color]) -> torch.tensor:
+    """
+    Returns the action tensors of a batch of positions as one (B, 8*8*73) tensor
+    """
 
-                #Right Diagonal Capture
-                i+=1
-                
-            elif toCol<col:
+    actionTensor = torch.zeros(len(batch_moves), 8*8*73)
 
-                #Left Diagonal Capture
-                i+=2
-            
-            moveTensor[(64+i)*8*8+row*8+col] = prob
+    batch_moves, batch_probs = zip(*(movesAndProbs(valid_moves) for valid_moves in batch_moves))
 
-        else:
+    moves = [move for valid_moves in batch_moves for move in valid_moves]
+    positions = np.repeat(np.arange(len(batch_moves)), [len(valid_moves) for valid_moves in batch_moves])
+    probs = np.concatenate(batch_probs)
 
-            squares = max(abs(toRow-row), abs(toCol-col))
+    indexes = movesToIndexes(moves, np.asarray(colors, dtype=bool)[positions])
 
-            direction = (check_polarity(toCol-col), check_polarity(toRow-row))
+    actionTensor.index_put_((torch.from_numpy(positions), torch.from_numpy(indexes)), torch.from_numpy(probs), accumulate=True)
 
-            moveTensor[(dir[direction]*7+(squares-1))*64+row*8+col] = prob
+    return actionTensor
 
-    else:
 
-        #Knight Move
+def actionToTensor(move:chess.Move, color:chess.Color=chess.WHITE, prob:float=1) -> torch.tensor:
+
+    moveTensor = torch.zeros(8*8*73)
 
-        moveTensor[(56+knight_moves[toCol-col,toRow-row])*64+row*8+col] = prob
+    moveTensor[moveToIndex(move.from_square, move.to_square, color, move.promotion)] = prob
     
     return moveTensor
 
 
-def tensorToAction(moves:torch.tensor, color:chess.Color=chess.WHITE, queen_promotion:dict={}) -> List[chess.Move]:
+def indexesToSquares(indexes:np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns col, row, toCol, toRow and promotion (index into PROMOTIONS) of every action index
+    """
 
-    #return all moves from tensor
+    planes, squares = np.divmod(indexes, 64)
+    row, col = np.divmod(squares, 8)
+
+    delta = PLANE_DELTAS[planes]
+
+    return col, row, col+delta[:, 0], row+delta[:, 1], PLANE_PROMOTIONS[planes]
 
-    moves = moves.nonzero()
+
+def indexesToMoves(color:chess.Color=chess.WHITE) -> List[Union[chess.Move, None]]:
+    """
+    Returns the move of every index in the 8*8*73 action tensor, None if the move leaves the board
+    """
 
     chess_moves = []
 
-    lettering = "abcdefgh"
-    numbering = "12345678"
+    squares = indexesToSquares(np.arange(8*8*73))
 
-    if color==chess.WHITE:
-        numbering = numbering[::-1]
-    else:
-        lettering = lettering[::-1]
+    for col, row, toCol, toRow, promotion in zip(*(array.tolist() for array in squares)):
 
-    #list for for movement, (x (+ ->), y (- ^))
-    #direction for both sets of movements start from top and rotates clockwise
-        
-    dir = [
-        (0,-1), #0
-        (1,-1), #1
-        (1,0), #2
-        (1,1), #3
-        (0,1), #4
-        (-1,1), #5
-        (-1,0), #6
-        (-1,-1) #7
-    ]
-
-    knight_moves = [
-        (1,-2), #0
-        (2,-1), #1
-        (2,1), #2
-        (1,2), #3
-        (-1,2), #4
-        (-2,1), #5
-        (-2,-1), #6
-        (-1,-2) #7
-    ]
-
-    for move in moves:
-
-        #check plane of move
-        plane = move//64
-
-        #check position of move
-        move %= 64
-        row = move//8
-        col = move%8
-
-        promotion = ""
-
-        if plane<56:
-            #queen move
-            direction = plane//7
-            squares = 1+plane%7
-
-            toCol = col+dir[direction][0]*squares
-            toRow = row+dir[direction][1]*squares
-
-            if queen_promotion.get(lettering[col]+numbering[row]+lettering[toCol]+numbering[toRow]+"q", False):
-                promotion = "q"
-        
-        elif plane<64:
-            #knight move
-            direction = plane - 56
-            
-            toCol = col+knight_moves[direction][0]
-            toRow = row+knight_moves[direction][1]
+        if not (0 <= toCol < 8 and 0 <= toRow < 8):
+            chess_moves.append(None)
+            continue
 
+        if color==chess.WHITE:
+            from_square = chess.square(col, 7-row)
+            to_square = chess.square(toCol, 7-toRow)
         else:
+            from_square = chess.square(7-col, row)
+            to_square = chess.square(7-toCol, toRow)
 
-            plane -= 64
+        chess_moves.append(chess.Move(from_square, to_square, promotion=PROMOTIONS[promotion]))
 
-            #Pawn promotion if not pawn
+    return chess_moves
 
-            #Forward from row 7
-            toRow = row-1
 
-            if plane%3==1:
+#Decoded move of every action index for each color
+ACTION_MOVES = {color: indexesToMoves(color) for color in chess.COLORS}
 
-                #Capture from row 7 right diagonal
-                toCol = col+1
-            
-            elif plane%3==2:
 
-                #Capture from row 7 left diagonal
-                toCol = col-1
-            
-            else:
-                toCol = col
+def tensorToAction(moves:torch.tensor, color:chess.Color=chess.WHITE, queen_promotion:dict={}) -> List[chess.Move]:
+
+    #return all moves from tensor
 
-            promotion = "nbr"[plane//3]
+    moves = moves.nonzero().flatten().tolist()
 
-        # print(row, toRow, col, toCol)
+    action_moves = ACTION_MOVES[color]
 
-        move_str = f"{lettering[col]}{numbering[row]}{lettering[toCol]}{numbering[toRow]}{promotion}"
+    chess_moves = [action_moves[move] for move in moves]
 
-        chess_moves.append(chess.Move.from_uci(move_str))
+    if None in chess_moves:
+        raise ValueError("Action index does not decode to a move on the board")
+
+    if queen_promotion:
+        chess_moves = [chess.Move(move.from_square, move.to_square, promotion=chess.QUEEN) if queen_promotion.get(move.uci()+"q", False) else move for move in chess_moves]
 
     return chess_moves
 
@@ -422,9 +477,11 @@ if __name__=="__main__":
 
     at2 = actionToTensor(action2,chess.BLACK)
 
-    atensor = torch.ones(4672)
+    start = chess.Board()
+
+    atensor, queen_promotion = actionsToTensor(list(start.legal_moves))
 
-    move_set = tensorToAction(atensor)
+    move_set = tensorToAction(atensor, queen_promotion=queen_promotion)
 
     move_set = set(move_set)
 
@@ -56,7 +56,8 @@ class MCTS0:
 
             if node.parent is not None:
                 node.game = copy.deepcopy(node.parent.game)
-                node.game.move_piece(node.action_taken)
+                # Children are only expanded from legal moves
+                node.game.move_piece_unchecked(node.action_taken)
             
             if verbose: print("Searching node")
             if verbose: print(node.game.board, node.color)
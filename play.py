@@ -2,7 +2,6 @@ from chess_tensor import ChessTensor
 import chess
 import torch
 from typing import List
-import copy
 import chess.svg
 from network import policyNN
 import torch
@@ -80,8 +79,8 @@ class PlayTensor():
     
     def get_previous_board_svg(self, moves: int) -> bool:
         """ Get the old board image """
-        # Make deep copy of the chess tensor
-        old_board = copy.deepcopy(self.game.board)
+        # Copy only the board and its move stack, the tensor is not needed for the image
+        old_board = self.game.board.copy(stack=True)
         for _ in range(moves):
             old_board.pop()
 
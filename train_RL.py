@@ -3,13 +3,14 @@ from network import policyNN
 from sim import generate_training_data
 from torch.optim import Adam, SGD
 from torch.utils.data import Dataset, DataLoader
-from chess_tensor import actionsToTensor
+from chess_tensor import batchActionsToTensor
+import numpy as np
 import time
 import torch.multiprocessing as mp
 from test_update import update_model
 from lightning.pytorch.loggers import TensorBoardLogger
 
-device = "cuda" if torch.cuda.is_available else "cpu"
+device = "cuda" if torch.cuda.is_available() else "cpu"
 
 class chessDataset(Dataset):
 
@@ -25,21 +26,21 @@ class chessDataset(Dataset):
 
     def __getitem__(self, index):
 
-        action_tensor = actionsToTensor(self.actions[index], color=self.colours[index])[0]
-
         reward = torch.tensor(self.rewards[index], requires_grad = False, dtype=torch.float)
 
-        return self.states[index], action_tensor, reward
+        return self.states[index], self.actions[index], self.colours[index], reward
 
     @staticmethod
     def collatefn(batch):
 
-        indexes = torch.arange(8).view(1,1,8)
+        states, actions, colours, rewards = zip(*batch)
 
-        states, actions, rewards = zip(*batch)
+        #Encode the whole batch at once
+        actions = batchActionsToTensor(actions, colours)
 
-        actions = torch.stack(actions, dim=0)
-        states = ((torch.stack(states, dim=0).to(dtype=torch.uint8).unsqueeze(-1) >> indexes)%2==1).to(dtype=torch.float)
+        #Each byte holds 8 squares, lowest bit first
+        states = torch.stack(states, dim=0).to(dtype=torch.uint8).numpy()
+        states = torch.from_numpy(np.unpackbits(states, axis=-1, bitorder="little").reshape(states.shape + (8,))).to(dtype=torch.float)
         rewards = torch.stack(rewards, dim=0)
 
         return {
@@ -57,10 +58,10 @@ def test(model=None, dataloader=None) -> dict:
     ce_loss = torch.tensor(0.)
 
     for idx, batch in enumerate(dataloader):
-        p, v = model(batch["states"].float().to(device))
+        p, v = model(batch["states"].float().to(device, non_blocking=True))
         v = v.squeeze(-1)
-        p_target = batch["actions"].to(device)
-        v_target = batch["rewards"].to(device)
+        p_target = batch["actions"].to(device, non_blocking=True)
+        v_target = batch["rewards"].to(device, non_blocking=True)
 
         mse_loss += torch.nn.functional.mse_loss(v, v_target).cpu()
         ce_loss += torch.nn.functional.cross_entropy(p, p_target).cpu()
@@ -102,10 +103,10 @@ def train(model=None,
 
         for idx, batch in enumerate(dataloader):
 
-            p, v = model(batch["states"].to(device))
+            p, v = model(batch["states"].to(device, non_blocking=True))
             v = v.squeeze(-1)
-            p_target = batch["actions"].to(device)
-            v_target = batch["rewards"].to(device)
+            p_target = batch["actions"].to(device, non_blocking=True)
+            v_target = batch["rewards"].to(device, non_blocking=True)
 
             mse_loss = torch.nn.functional.mse_loss(v, v_target)
             ce_loss = torch.nn.functional.cross_entropy(p, p_target)
@@ -1,3 +1,4 @@
+import os
 import torch
 from network import policyNN
 from torch.optim import Adam, SGD
@@ -7,7 +8,7 @@ from chess_tensor import actionsToTensor, tensorToAction
 from train_RL import train, chessDataset, test
 from lightning.pytorch.loggers import TensorBoardLogger
 
-device = "cuda" if torch.cuda.is_available else "cpu"
+device = "cuda" if torch.cuda.is_available() else "cpu"
 
 def main(train_config=None, optimiser=None, lr_scheduler=None, logger=None, resume=False):
 
@@ -44,16 +45,27 @@ def main(train_config=None, optimiser=None, lr_scheduler=None, logger=None, resu
 
     split_datasets = torch.utils.data.random_split(datasets, [0.8,0.2])
 
+    #Collate batches in parallel and pin them for async copies when training on GPU
+    if device == "cuda":
+        loader_config = {
+            "num_workers": max(1, os.cpu_count()//2),
+            "pin_memory": True,
+            "persistent_workers": True,
+            "prefetch_factor": 4,
+        }
+    else:
+        loader_config = {"num_workers": 0}
+
     train_dataloader = DataLoader(dataset=split_datasets[0],
                                   batch_size = batch_size,
                                   shuffle=True,
-                                  num_workers=0,
-                                  collate_fn=datasets.collatefn)
+                                  collate_fn=datasets.collatefn,
+                                  **loader_config)
 
     test_dataloader = DataLoader(dataset=split_datasets[1],
                                   batch_size = batch_size,
-                                  num_workers=0,
-                                  collate_fn=datasets.collatefn)
+                                  collate_fn=datasets.collatefn,
+                                  **loader_config)
 
 
     train(model=model,